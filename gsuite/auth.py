@@ -1,23 +1,58 @@
 import os
-import pickle
 import json
-from json.decoder import JSONDecodeError
+import logging
+import weakref
+import hashlib
+import tempfile
+import datetime
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from google.auth import _helpers as google_auth_helpers
 from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials as UserCredentials
 from google.oauth2.service_account import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
-def get_credentials(auth_mode, client_secrets, oauth2_scopes, delegated_email_address=None, local_server_port=None, token_file="token.pickle"):
+_LOGGER = logging.getLogger(__name__)
+
+# Credentials already obtained in this process, keyed by
+# (auth_mode, client_secrets digest, sorted scopes, delegated email address, token file).
+# Only the _CREDENTIALS_CACHE_SIZE most recently used are kept.
+_CREDENTIALS_CACHE = OrderedDict()
+_CREDENTIALS_CACHE_SIZE = 32
+_CREDENTIALS_CACHE_LOCK = threading.Lock()
+
+# Credentials expiring within this delay are refreshed in the background before they are used (see refresh_ahead).
+# google-auth already reports credentials as expired REFRESH_THRESHOLD (3m45s) before their actual expiry and then
+# refreshes them synchronously, so the background window is measured on top of it.
+_REFRESH_AHEAD = google_auth_helpers.REFRESH_THRESHOLD + datetime.timedelta(minutes=5)
+_REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+_REFRESHING = set()
+_REFRESHING_LOCK = threading.Lock()
+
+# Token files to write back to when user credentials are refreshed.
+_TOKEN_FILES = weakref.WeakKeyDictionary()
+
+
+def get_credentials(auth_mode, client_secrets, oauth2_scopes, delegated_email_address=None, local_server_port=None, token_file="token.json"):
     """
     A method to get a valid credentials to interact with Google API
 
     Args:
         auth_mode (str): Mode of authentication & authorization. Valid values are only 'server_side' and 'service_account'.
         client_secrets (str): The path to the credentials json file or credentials information in json format (only for auth_mode=service_account).
-        oauth2_scopes (list of str): Scopes to request during the authorization grant.
+        oauth2_scopes (sequence of str): Scopes to request during the authorization grant.
         delegated_email_address (str): Must be set if using 'service_account' as auth_mode. For domain-wide delegation, the email address of the user to for which to request delegated access.
         local_server_port (int): Must be set if using 'server_side' as auth_mode. The port for the local redirect server.
-        token_file (str): Used only if using 'server_side' as auth_mode. The path where to store and load a temporary credentials information. (default "token.pickle")
+        token_file (str): Used only if using 'server_side' as auth_mode. The path where to store and load a temporary credentials information. (default "token.json")
 
     Returns:
         google.auth.service_account.Credentials if 'service_account' as auth_mode else google.oauth2.credentials.Credentials
@@ -26,42 +61,58 @@ def get_credentials(auth_mode, client_secrets, oauth2_scopes, delegated_email_ad
     server_side = "server_side"
     service_account = "service_account"
 
-    credentials = None
     if auth_mode == server_side:
         if local_server_port is None:
             raise ValueError(
-                "'local_server_port' argument must be set if 'auth_mode' is set to '{}'".format(
-                    server_side
-                )
-            )
-        else:
-            credentials = server_side_web_apps_auth(
-                client_secrets_file=client_secrets,
-                oauth2_scopes=oauth2_scopes,
-                local_server_port=local_server_port,
-                token_file=token_file
+                f"'local_server_port' argument must be set if 'auth_mode' is set to '{server_side}'"
             )
     elif auth_mode == service_account:
         if delegated_email_address is None:
             raise ValueError(
-                "'delegated_email_address' argument must be set if 'auth_mode' is set to '{}'".format(
-                    service_account
-                )
-            )
-        else:
-            credentials = service_account_auth(
-                client_secrets=client_secrets,
-                oauth2_scopes=oauth2_scopes,
-                delegated_email_address=delegated_email_address
+                f"'delegated_email_address' argument must be set if 'auth_mode' is set to '{service_account}'"
             )
     else:
         raise ValueError(
-            "'auth_mode' argument only allows '{server_side}' or '{service_account}' as input".format(
-                server_side=server_side,
-                service_account=service_account
-            )
+            f"'auth_mode' argument only allows '{server_side}' or '{service_account}' as input"
+        )
+
+    key = (
+        auth_mode,
+        hashlib.blake2b(str(client_secrets).encode()).digest(),
+        tuple(sorted(oauth2_scopes)),
+        delegated_email_address,
+        token_file
+    )
+
+    with _CREDENTIALS_CACHE_LOCK:
+        credentials = _CREDENTIALS_CACHE.get(key)
+        if credentials is not None:
+            _CREDENTIALS_CACHE.move_to_end(key)
+
+    if credentials is not None:
+        if credentials.expired and getattr(credentials, "refresh_token", None):
+            _refresh_credentials(credentials)
+        return credentials
+
+    if auth_mode == server_side:
+        credentials = server_side_web_apps_auth(
+            client_secrets_file=client_secrets,
+            oauth2_scopes=oauth2_scopes,
+            local_server_port=local_server_port,
+            token_file=token_file
+        )
+    else:
+        credentials = service_account_auth(
+            client_secrets=client_secrets,
+            oauth2_scopes=oauth2_scopes,
+            delegated_email_address=delegated_email_address
         )
 
+    with _CREDENTIALS_CACHE_LOCK:
+        _CREDENTIALS_CACHE[key] = credentials
+        if len(_CREDENTIALS_CACHE) > _CREDENTIALS_CACHE_SIZE:
+            _CREDENTIALS_CACHE.popitem(last=False)
+
     return credentials
 
 
@@ -71,31 +122,47 @@ def service_account_auth(client_secrets, oauth2_scopes, delegated_email_address)
 
     Args:
         client_secrets (str): The path to the credentials json file or credentials information in json format.
-        oauth2_scopes (list of str): Scopes to request during the authorization grant.
+        oauth2_scopes (sequence of str): Scopes to request during the authorization grant.
         delegated_email_address (str): For domain-wide delegation, the email address of the user to for which to request delegated access.
 
     Returns:
         google.auth.service_account.Credentials: Service account credentials
     """
 
-    try:
-        data = json.loads(client_secrets)
+    # Every call gets its own copy, so refreshing the returned credentials never touches the cached ones.
+    return _service_account_credentials(
+        client_secrets=client_secrets,
+        oauth2_scopes=tuple(sorted(oauth2_scopes))
+    ).with_subject(delegated_email_address)
 
-        # https://google-auth.readthedocs.io/en/latest/reference/google.oauth2.service_account.html
-        return Credentials.from_service_account_info(
-            data,
-            scopes=oauth2_scopes,
-            subject=delegated_email_address
-        )
-    except JSONDecodeError:
-        data = client_secrets
-
-        # https://google-auth.readthedocs.io/en/latest/reference/google.oauth2.service_account.html
-        return Credentials.from_service_account_file(
-            client_secrets,
-            scopes=oauth2_scopes,
-            subject=delegated_email_address
-        )
+
+@functools.lru_cache(maxsize=32)
+def _service_account_credentials(client_secrets, oauth2_scopes):
+    """
+    Private method to create service account credentials without a subject.
+    The key is only parsed and validated once per process for the same arguments.
+
+    Args:
+        client_secrets (str): The path to the credentials json file or credentials information in json format.
+        oauth2_scopes (tuple of str): Scopes to request during the authorization grant.
+
+    Returns:
+        google.auth.service_account.Credentials: Service account credentials
+    """
+
+    # The key file is read and parsed here rather than with Credentials.from_service_account_file,
+    # so both forms go through _json_loads (orjson when installed) instead of the stdlib json module.
+    if client_secrets.lstrip().startswith("{"):
+        data = _json_loads(client_secrets)
+    else:
+        with open(client_secrets, "rb") as secrets_file:
+            data = _json_loads(secrets_file.read())
+
+    # https://google-auth.readthedocs.io/en/latest/reference/google.oauth2.service_account.html
+    return Credentials.from_service_account_info(
+        data,
+        scopes=oauth2_scopes
+    )
 
 
 def server_side_web_apps_auth(client_secrets_file, oauth2_scopes, local_server_port, token_file):
@@ -104,7 +171,7 @@ def server_side_web_apps_auth(client_secrets_file, oauth2_scopes, local_server_p
 
     Args:
         client_secrets_file (str): The path to the client secrets *.json file.
-        oauth2_scopes (list of str): The list of oauth2 scopes to request during the flow.
+        oauth2_scopes (sequence of str): The list of oauth2 scopes to request during the flow.
         local_server_port (int): The port for the local redirect server.
         token_file (str): The path where to store and load a temporary credentials information
 
@@ -115,13 +182,25 @@ def server_side_web_apps_auth(client_secrets_file, oauth2_scopes, local_server_p
     # Initialize credentials
     credentials = None
 
-    # The file token.pickle stores the user"s access and refresh tokens, and is
+    # The file token.json stores the user"s access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first time.
     if os.path.exists(token_file):
         with open(token_file, "rb") as token:
-            credentials = pickle.load(token)
+            token_data = token.read()
+
+        # A corrupt file or a token without refresh_token (Google omits it when the user re-consents to
+        # already granted scopes) raises ValueError, which json and orjson decode errors both derive from.
+        # Such a token is treated as missing so the user is asked to log in again.
+        try:
+            credentials = UserCredentials.from_authorized_user_info(
+                _json_loads(token_data),
+                scopes=oauth2_scopes
+            )
+        except ValueError:
+            credentials = None
 
     # If there are no (valid) credentials available, let the user log in.
+    # The token file is only rewritten when the credentials changed, i.e. after a refresh or a new login.
     if not credentials or not credentials.valid:
         if credentials and credentials.expired and credentials.refresh_token:
             credentials.refresh(Request())
@@ -133,7 +212,96 @@ def server_side_web_apps_auth(client_secrets_file, oauth2_scopes, local_server_p
             credentials = flow.run_local_server(port=local_server_port)
 
         # Save the credentials for the next run
-        with open(token_file, "wb") as token:
-            pickle.dump(credentials, token)
+        save_token(token_file=token_file, credentials=credentials)
+
+    _TOKEN_FILES[credentials] = token_file
 
     return credentials
+
+
+def save_token(token_file, credentials):
+    """
+    Atomically writes user credentials to a token file readable only by the current user.
+
+    Args:
+        token_file (str): The path where to store the credentials information.
+        credentials (google.oauth2.credentials.Credentials): The credentials to store.
+    """
+
+    token_data = credentials.to_json().encode()
+
+    # mkstemp gives every writer its own file, created with 0600 permissions, in the same directory as
+    # token_file so that os.replace stays an atomic rename.
+    fd, temporary_file = tempfile.mkstemp(dir=os.path.dirname(token_file) or ".")
+    try:
+        with os.fdopen(fd, "wb") as token:
+            token.write(token_data)
+        os.replace(temporary_file, token_file)
+    except BaseException:
+        os.unlink(temporary_file)
+        raise
+
+
+def refresh_ahead(credentials):
+    """
+    Refreshes the credentials in a background thread during the 5 minutes before google-auth would consider them expired,
+    so that the following requests do not have to wait for a synchronous refresh.
+    Refreshed user credentials are written back to their token file.
+
+    Args:
+        credentials (google.auth.credentials.Credentials): The credentials about to be used.
+    """
+
+    # Credentials that are already expired are refreshed synchronously by AuthorizedHttp before the request,
+    # refreshing them here as well would race with it.
+    expiry = credentials.expiry
+    if credentials.token is None or expiry is None or credentials.expired:
+        return
+
+    if isinstance(credentials, UserCredentials) and not credentials.refresh_token:
+        return
+
+    # google-auth stores expiry as a naive datetime in UTC.
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    if expiry - now > _REFRESH_AHEAD:
+        return
+
+    with _REFRESHING_LOCK:
+        if credentials in _REFRESHING:
+            return
+        _REFRESHING.add(credentials)
+
+    _REFRESH_EXECUTOR.submit(_refresh_in_background, credentials)
+
+
+def _refresh_in_background(credentials):
+    """
+    Private method to refresh credentials scheduled by refresh_ahead.
+
+    Args:
+        credentials (google.auth.credentials.Credentials): The credentials to refresh.
+    """
+
+    try:
+        _refresh_credentials(credentials)
+    except Exception:
+        # The request path refreshes the credentials itself once they expire, so this is not fatal.
+        _LOGGER.warning("Failed to refresh credentials ahead of expiry", exc_info=True)
+    finally:
+        with _REFRESHING_LOCK:
+            _REFRESHING.discard(credentials)
+
+
+def _refresh_credentials(credentials):
+    """
+    Private method to refresh credentials and write them back to their token file, if any.
+
+    Args:
+        credentials (google.auth.credentials.Credentials): The credentials to refresh.
+    """
+
+    credentials.refresh(Request())
+
+    token_file = _TOKEN_FILES.get(credentials)
+    if token_file is not None:
+        save_token(token_file=token_file, credentials=credentials)
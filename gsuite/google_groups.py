@@ -1,5 +1,85 @@
+import queue
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from gsuite.auth import get_credentials
-from googleapiclient.discovery import build
+from gsuite.service import authorized_http, build_service
+
+
+# If modifying these scopes, delete the file token.json.
+#
+# Read more about oauth2 scopes:
+# https://developers.google.com/identity/protocols/oauth2/scopes
+_OAUTH2_SCOPES = (
+    "https://www.googleapis.com/auth/admin.directory.group",
+    "https://www.googleapis.com/auth/admin.directory.group.member",
+    "https://www.googleapis.com/auth/apps.groups.settings"
+)
+
+# Maximum number of calls the Directory API accepts in a single batch request.
+# https://developers.google.com/admin-sdk/directory/v1/guides/batch
+_BATCH_LIMIT = 1000
+
+# Settings applied by GoogleGroups.update_group_settings when no body is given.
+# https://developers.google.com/admin-sdk/groups-settings/v1/reference/groups
+_DEFAULT_GROUP_SETTINGS = {
+    "kind": "groupsSettings#groups",
+    "whoCanJoin": "CAN_REQUEST_TO_JOIN",
+    "whoCanViewMembership": "ALL_IN_DOMAIN_CAN_VIEW",
+    "whoCanViewGroup": "ALL_MEMBERS_CAN_VIEW",
+    "whoCanInvite": "ALL_MANAGERS_CAN_INVITE",
+    "whoCanAdd": "ALL_MANAGERS_CAN_ADD",
+    "allowExternalMembers": "false",
+    "whoCanPostMessage": "ANYONE_CAN_POST",
+    "allowWebPosting": "false",
+    "maxMessageBytes": 26214400,
+    "isArchived": "true",
+    "archiveOnly": "false",
+    "messageModerationLevel": "MODERATE_NONE",
+    "spamModerationLevel": "MODERATE",
+    "replyTo": "REPLY_TO_IGNORE",
+    "customReplyTo": "",
+    "includeCustomFooter": "false",
+    "customFooterText": "",
+    "sendMessageDenyNotification": "false",
+    "defaultMessageDenyNotificationText": "",
+    "showInGroupDirectory": "false",
+    "allowGoogleCommunication": "false",
+    "membersCanPostAsTheGroup": "false",
+    "messageDisplayFont": "DEFAULT_FONT",
+    "includeInGlobalAddressList": "true",
+    "whoCanLeaveGroup": "ALL_MEMBERS_CAN_LEAVE",
+    "whoCanContactOwner": "ALL_IN_DOMAIN_CAN_CONTACT",
+    "whoCanAddReferences": "NONE",
+    "whoCanAssignTopics": "NONE",
+    "whoCanUnassignTopic": "NONE",
+    "whoCanTakeTopics": "NONE",
+    "whoCanMarkDuplicate": "NONE",
+    "whoCanMarkNoResponseNeeded": "NONE",
+    "whoCanMarkFavoriteReplyOnAnyTopic": "NONE",
+    "whoCanMarkFavoriteReplyOnOwnTopic": "NONE",
+    "whoCanUnmarkFavoriteReplyOnAnyTopic": "NONE",
+    "whoCanEnterFreeFormTags": "NONE",
+    "whoCanModifyTagsAndCategories": "NONE",
+    "favoriteRepliesOnTop": "false",
+    "whoCanApproveMembers": "ALL_MANAGERS_CAN_APPROVE",
+    "whoCanBanUsers": "OWNERS_AND_MANAGERS",
+    "whoCanModifyMembers": "OWNERS_AND_MANAGERS",
+    "whoCanApproveMessages": "OWNERS_AND_MANAGERS",
+    "whoCanDeleteAnyPost": "OWNERS_AND_MANAGERS",
+    "whoCanDeleteTopics": "OWNERS_AND_MANAGERS",
+    "whoCanLockTopics": "OWNERS_AND_MANAGERS",
+    "whoCanMoveTopicsIn": "OWNERS_AND_MANAGERS",
+    "whoCanMoveTopicsOut": "OWNERS_AND_MANAGERS",
+    "whoCanPostAnnouncements": "OWNERS_AND_MANAGERS",
+    "whoCanHideAbuse": "NONE",
+    "whoCanMakeTopicsSticky": "NONE",
+    "whoCanModerateMembers": "OWNERS_AND_MANAGERS",
+    "whoCanModerateContent": "OWNERS_AND_MANAGERS",
+    "whoCanAssistContent": "NONE",
+    "customRolesEnabledForSettingsToBeMerged": "false",
+    "enableCollaborativeInbox": "false",
+    "whoCanDiscoverGroup": "ALL_MEMBERS_CAN_DISCOVER"
+}
 
 
 class GoogleGroups:
@@ -14,36 +94,53 @@ class GoogleGroups:
     """
 
     def __init__(self, auth_mode, client_secrets, delegated_email_address=None, local_server_port=None):
-        # If modifying these scopes, delete the file token.pickle.
-        #
-        # Read more about oauth2 scopes:
-        # https://developers.google.com/identity/protocols/oauth2/scopes
-        oauth2_scopes = [
-            "https://www.googleapis.com/auth/admin.directory.group",
-            "https://www.googleapis.com/auth/admin.directory.group.member",
-            "https://www.googleapis.com/auth/apps.groups.settings"
-        ]
-
-        credentials = get_credentials(
+        self._credentials = get_credentials(
             auth_mode=auth_mode,
             client_secrets=client_secrets,
-            oauth2_scopes=oauth2_scopes,
+            oauth2_scopes=_OAUTH2_SCOPES,
             delegated_email_address=delegated_email_address,
             local_server_port=local_server_port
         )
 
+        # One HTTP client per instance, shared by the services of this instance only.
+        # httplib2 is not thread-safe, so an instance must not be used from several threads.
+        self._http = authorized_http(self._credentials)
+
+        # Idle HTTP clients of the worker threads used by the bulk methods, reused across calls.
+        self._worker_http = queue.SimpleQueue()
+
         # http://googleapis.github.io/google-api-python-client/docs/dyn/admin_directory_v1.html
-        self.admin_directory = build(
-            serviceName="admin",
+        self.admin_directory = build_service(
+            service_name="admin",
             version="directory_v1",
-            credentials=credentials
+            http=self._http
         )
 
-        # http://googleapis.github.io/google-api-python-client/docs/dyn/groupssettings_v1.html
-        self.groupsettings = build(
-            serviceName="groupssettings",
+    def close(self):
+        """
+        Closes the connections kept alive by this instance. The instance can not be used afterwards.
+        """
+
+        self._http.close()
+
+        while not self._worker_http.empty():
+            self._worker_http.get_nowait().close()
+
+    @functools.cached_property
+    def groupsettings(self):
+        """
+        The Groups Settings service, only built the first time it is used.
+
+        Docs: http://googleapis.github.io/google-api-python-client/docs/dyn/groupssettings_v1.html
+
+        Returns:
+            googleapiclient.discovery.Resource: A Resource object with methods for interacting with the Groups Settings API.
+        """
+
+        return build_service(
+            service_name="groupssettings",
             version="v1",
-            credentials=credentials
+            http=self._http
         )
 
     def create_group(self, email, name, description):
@@ -144,65 +241,7 @@ class GoogleGroups:
         """
 
         if body is None:
-            body = {
-                "kind": "groupsSettings#groups",
-                "whoCanJoin": "CAN_REQUEST_TO_JOIN",
-                "whoCanViewMembership": "ALL_IN_DOMAIN_CAN_VIEW",
-                "whoCanViewGroup": "ALL_MEMBERS_CAN_VIEW",
-                "whoCanInvite": "ALL_MANAGERS_CAN_INVITE",
-                "whoCanAdd": "ALL_MANAGERS_CAN_ADD",
-                "allowExternalMembers": "false",
-                "whoCanPostMessage": "ANYONE_CAN_POST",
-                "allowWebPosting": "false",
-                "maxMessageBytes": 26214400,
-                "isArchived": "true",
-                "archiveOnly": "false",
-                "messageModerationLevel": "MODERATE_NONE",
-                "spamModerationLevel": "MODERATE",
-                "replyTo": "REPLY_TO_IGNORE",
-                "customReplyTo": "",
-                "includeCustomFooter": "false",
-                "customFooterText": "",
-                "sendMessageDenyNotification": "false",
-                "defaultMessageDenyNotificationText": "",
-                "showInGroupDirectory": "false",
-                "allowGoogleCommunication": "false",
-                "membersCanPostAsTheGroup": "false",
-                "messageDisplayFont": "DEFAULT_FONT",
-                "includeInGlobalAddressList": "true",
-                "whoCanLeaveGroup": "ALL_MEMBERS_CAN_LEAVE",
-                "whoCanContactOwner": "ALL_IN_DOMAIN_CAN_CONTACT",
-                "whoCanAddReferences": "NONE",
-                "whoCanAssignTopics": "NONE",
-                "whoCanUnassignTopic": "NONE",
-                "whoCanTakeTopics": "NONE",
-                "whoCanMarkDuplicate": "NONE",
-                "whoCanMarkNoResponseNeeded": "NONE",
-                "whoCanMarkFavoriteReplyOnAnyTopic": "NONE",
-                "whoCanMarkFavoriteReplyOnOwnTopic": "NONE",
-                "whoCanUnmarkFavoriteReplyOnAnyTopic": "NONE",
-                "whoCanEnterFreeFormTags": "NONE",
-                "whoCanModifyTagsAndCategories": "NONE",
-                "favoriteRepliesOnTop": "false",
-                "whoCanApproveMembers": "ALL_MANAGERS_CAN_APPROVE",
-                "whoCanBanUsers": "OWNERS_AND_MANAGERS",
-                "whoCanModifyMembers": "OWNERS_AND_MANAGERS",
-                "whoCanApproveMessages": "OWNERS_AND_MANAGERS",
-                "whoCanDeleteAnyPost": "OWNERS_AND_MANAGERS",
-                "whoCanDeleteTopics": "OWNERS_AND_MANAGERS",
-                "whoCanLockTopics": "OWNERS_AND_MANAGERS",
-                "whoCanMoveTopicsIn": "OWNERS_AND_MANAGERS",
-                "whoCanMoveTopicsOut": "OWNERS_AND_MANAGERS",
-                "whoCanPostAnnouncements": "OWNERS_AND_MANAGERS",
-                "whoCanHideAbuse": "NONE",
-                "whoCanMakeTopicsSticky": "NONE",
-                "whoCanModerateMembers": "OWNERS_AND_MANAGERS",
-                "whoCanModerateContent": "OWNERS_AND_MANAGERS",
-                "whoCanAssistContent": "NONE",
-                "customRolesEnabledForSettingsToBeMerged": "false",
-                "enableCollaborativeInbox": "false",
-                "whoCanDiscoverGroup": "ALL_MEMBERS_CAN_DISCOVER"
-            }
+            body = _DEFAULT_GROUP_SETTINGS.copy()
 
         return self.groupsettings.groups().patch(groupUniqueId=group_email, body=body).execute()
 
@@ -270,7 +309,7 @@ class GoogleGroups:
             "type": member_type,
             "email": member_email
         }
-        return self.admin_directory.members().insert(groupKey=group_key, body=body).execute()
+        return self._members_insert_request(group_key=group_key, body=body).execute()
 
     def update_member(self, group_key, member_key, member_role=None, delivery_settings=None):
         """
@@ -294,13 +333,15 @@ class GoogleGroups:
                 }
         """
 
-        member = self.get_member(group_key=group_key, member_key=member_key)
+        # Only fetch the current membership when a field has to be filled in from it.
+        if member_role is None or delivery_settings is None:
+            member = self.get_member(group_key=group_key, member_key=member_key)
 
-        if member_role is None:
-            member_role = member["role"]
+            if member_role is None:
+                member_role = member["role"]
 
-        if delivery_settings is None:
-            delivery_settings = member["delivery_settings"]
+            if delivery_settings is None:
+                delivery_settings = member["delivery_settings"]
 
         body = {
             "delivery_settings": delivery_settings,
@@ -319,41 +360,238 @@ class GoogleGroups:
                               The value can be the member's (group or user) primary email address, alias, or unique ID.
         """
 
-        self.admin_directory.members().delete(
-            groupKey=group_key,
-            memberKey=member_key
-        ).execute()
+        self._members_delete_request(group_key=group_key, member_key=member_key).execute()
 
-    def list_members(self, group_key):
+    def list_members(self, group_key, max_results=200):
         """
         Retrieve all members in a group.
+        Pages are fetched lazily while the returned generator is consumed.
 
         Args:
-            group_key (str):  Identifies the group in the API request. The value can be the group's email address, group alias, or the unique group ID.
+            group_key (str):   Identifies the group in the API request. The value can be the group's email address, group alias, or the unique group ID.
+            max_results (int): Maximum number of members fetched per page. The API allows at most 200. (default 200)
 
-        Returns:
+        Yields:
             dict:
-                { # JSON response template for List Members operation in Directory API.
-                    # Token used to access next page of this result.
-                    "nextPageToken": "A String",
+                { # JSON template for Member resource in Directory API.
+                    "status": "A String", # Status of member (Immutable)
                     # Kind of resource this is.
-                    "kind": "admin#directory#members",
+                    "kind": "admin#directory#member",
+                    "delivery_settings": "A String", # Delivery settings of member
+                    # Unique identifier of customer member (Read-only) Unique identifier of group (Read-only) Unique identifier of member (Read-only)
+                    "id": "A String",
                     "etag": "A String", # ETag of the resource.
-                    "members": [ # List of member objects.
-                    { # JSON template for Member resource in Directory API.
-                        "status": "A String", # Status of member (Immutable)
-                        # Kind of resource this is.
-                        "kind": "admin#directory#member",
-                        "delivery_settings": "A String", # Delivery settings of member
-                        # Unique identifier of customer member (Read-only) Unique identifier of group (Read-only) Unique identifier of member (Read-only)
-                        "id": "A String",
-                        "etag": "A String", # ETag of the resource.
-                        "role": "A String", # Role of member
-                        "type": "A String", # Type of member (Immutable)
-                        "email": "A String", # Email of member (Read-only)
-                        },
-                    ],
+                    "role": "A String", # Role of member
+                    "type": "A String", # Type of member (Immutable)
+                    "email": "A String", # Email of member (Read-only)
                 }
         """
 
-        return self.admin_directory.members().list(groupKey=group_key).execute()
+        request = self.admin_directory.members().list(groupKey=group_key, maxResults=max_results)
+        while request is not None:
+            response = request.execute()
+            yield from response.get("members", [])
+            request = self.admin_directory.members().list_next(request, response)
+
+    def add_members_bulk(self, group_key, members):
+        """
+        Adds many members to the specified group using batch requests (up to 1000 members per HTTP round-trip).
+
+        Args:
+            group_key (str):        Identifies the group in the API request. The value can be the group's email address, group alias, or the unique group ID.
+            members (list of dict): Member resources to insert. Each dict follows the body used by add_member, e.g.
+                                    {"email": "user@example.com", "role": "MEMBER", "type": "USER", "delivery_settings": "ALL_MAIL"}
+
+        Returns:
+            list of dict: The inserted members, in the same order as `members`.
+
+        Raises:
+            googleapiclient.errors.HttpError: If any of the insertions fails. Insertions sent in the same or earlier batches may already be applied.
+        """
+
+        return self._execute_batch([
+            self._members_insert_request(group_key=group_key, body=member)
+            for member in members
+        ])
+
+    def delete_members_bulk(self, group_key, member_keys):
+        """
+        Deletes many members from a group using batch requests (up to 1000 members per HTTP round-trip).
+
+        Args:
+            group_key (str):           Identifies the group in the API request. The value can be the group's email address, group alias, or the unique group ID.
+            member_keys (list of str): Identifies the group members to delete. Each value can be the member's (group or user) primary email address, alias, or unique ID.
+
+        Raises:
+            googleapiclient.errors.HttpError: If any of the deletions fails. Deletions sent in the same or earlier batches may already be applied.
+        """
+
+        self._execute_batch([
+            self._members_delete_request(group_key=group_key, member_key=member_key)
+            for member_key in member_keys
+        ])
+
+    def list_members_bulk(self, group_keys):
+        """
+        Retrieve all members of many groups using batch requests.
+        The first page of every group is fetched in one batch, then the following pages of all groups that have more members, and so on.
+
+        Args:
+            group_keys (list of str): Identifies the groups in the API request. Each value can be the group's email address, group alias, or the unique group ID.
+
+        Returns:
+            dict: Mapping of each group key to its list of member resources (see list_members).
+        """
+
+        members = {group_key: [] for group_key in group_keys}
+        pending = [
+            (group_key, self.admin_directory.members().list(groupKey=group_key, maxResults=200))
+            for group_key in members
+        ]
+
+        while pending:
+            responses = self._execute_batch([request for _, request in pending])
+
+            next_pending = []
+            for (group_key, request), response in zip(pending, responses):
+                members[group_key].extend(response.get("members", []))
+
+                next_request = self.admin_directory.members().list_next(request, response)
+                if next_request is not None:
+                    next_pending.append((group_key, next_request))
+
+            pending = next_pending
+
+        return members
+
+    def bulk_get_members(self, pairs, max_workers=16):
+        """
+        Get many existing members concurrently.
+
+        Args:
+            pairs (list of tuple): (group_key, member_key) pairs identifying the memberships to get (see get_member).
+            max_workers (int):     Maximum number of requests in flight at the same time. (default 16)
+
+        Returns:
+            list of dict: The member resources, in the same order as `pairs`.
+        """
+
+        return self._execute_concurrently([
+            self.admin_directory.members().get(groupKey=group_key, memberKey=member_key)
+            for group_key, member_key in pairs
+        ], max_workers=max_workers)
+
+    def bulk_update_group_settings(self, group_emails, body=None, max_workers=16):
+        """
+        Updates the settings of many existing groups concurrently.
+
+        Args:
+            group_emails (list of str): The groups' email addresses.
+            body (dict):                https://developers.google.com/admin-sdk/groups-settings/v1/reference/groups (default to None but will be overriden)
+            max_workers (int):          Maximum number of requests in flight at the same time. (default 16)
+
+        Returns:
+            list of dict: https://developers.google.com/admin-sdk/groups-settings/v1/reference/groups, in the same order as `group_emails`.
+        """
+
+        if body is None:
+            body = _DEFAULT_GROUP_SETTINGS.copy()
+
+        return self._execute_concurrently([
+            self.groupsettings.groups().patch(groupUniqueId=group_email, body=body)
+            for group_email in group_emails
+        ], max_workers=max_workers)
+
+    def _members_insert_request(self, group_key, body):
+        """
+        Prepares, without executing, a request which adds a member to a group.
+
+        Args:
+            group_key (str): Identifies the group in the API request. The value can be the group's email address, group alias, or the unique group ID.
+            body (dict):     The member resource to insert (see add_member).
+
+        Returns:
+            googleapiclient.http.HttpRequest: The request, to be executed directly or added to a batch.
+        """
+
+        return self.admin_directory.members().insert(groupKey=group_key, body=body)
+
+    def _members_delete_request(self, group_key, member_key):
+        """
+        Prepares, without executing, a request which removes a member from a group.
+
+        Args:
+            group_key (str):  Identifies the group in the API request. The value can be the group's email address, group alias, or the unique group ID.
+            member_key (str): Identifies the group member in the API request. The value can be the member's (group or user) primary email address, alias, or unique ID.
+
+        Returns:
+            googleapiclient.http.HttpRequest: The request, to be executed directly or added to a batch.
+        """
+
+        return self.admin_directory.members().delete(groupKey=group_key, memberKey=member_key)
+
+    def _execute_batch(self, requests):
+        """
+        Executes Directory API requests in batches of at most _BATCH_LIMIT calls.
+
+        Args:
+            requests (list of googleapiclient.http.HttpRequest): The requests to execute.
+
+        Returns:
+            list: The response of each request, in the same order as `requests`.
+
+        Raises:
+            googleapiclient.errors.HttpError: The first error returned, after the batch containing it has completed.
+        """
+
+        responses = [None] * len(requests)
+        errors = []
+
+        def callback(request_id, response, exception):
+            if exception is not None:
+                errors.append(exception)
+            else:
+                responses[int(request_id)] = response
+
+        for offset in range(0, len(requests), _BATCH_LIMIT):
+            batch = self.admin_directory.new_batch_http_request(callback=callback)
+            for index, request in enumerate(requests[offset:offset + _BATCH_LIMIT], start=offset):
+                batch.add(request, request_id=str(index))
+            batch.execute()
+
+            if errors:
+                raise errors[0]
+
+        return responses
+
+    def _execute_concurrently(self, requests, max_workers):
+        """
+        Executes independent requests from a pool of threads.
+        httplib2.Http is not thread-safe, so every request in flight uses an HTTP client of its own,
+        taken from the idle clients of this instance and given back once the request is done.
+        At most `max_workers` clients are created, and their connections are reused by the following calls.
+
+        Args:
+            requests (list of googleapiclient.http.HttpRequest): The requests to execute.
+            max_workers (int): Maximum number of requests in flight at the same time.
+
+        Returns:
+            list: The response of each request, in the same order as `requests`.
+
+        Raises:
+            googleapiclient.errors.HttpError: The first error returned, in the order of `requests`.
+        """
+
+        def execute(request):
+            try:
+                http = self._worker_http.get_nowait()
+            except queue.Empty:
+                http = authorized_http(self._credentials)
+
+            try:
+                return request.execute(http=http)
+            finally:
+                self._worker_http.put(http)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(execute, requests))
@@ -1,6 +1,21 @@
+import io
 import json
 from gsuite.auth import get_credentials
-from googleapiclient.discovery import build
+from gsuite.service import authorized_http, build_service
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+# If modifying these scopes, delete the file token.json.
+#
+# Read more about oauth2 scopes:
+# https://developers.google.com/identity/protocols/oauth2/scopes
+_OAUTH2_SCOPES = (
+    "https://www.googleapis.com/auth/spreadsheets",
+)
 
 
 class GoogleSheets:
@@ -15,29 +30,31 @@ class GoogleSheets:
     """
 
     def __init__(self, auth_mode, client_secrets, delegated_email_address=None, local_server_port=None):
-        # If modifying these scopes, delete the file token.pickle.
-        #
-        # Read more about oauth2 scopes:
-        # https://developers.google.com/identity/protocols/oauth2/scopes
-        oauth2_scopes = [
-            "https://www.googleapis.com/auth/spreadsheets"
-        ]
-
         credentials = get_credentials(
             auth_mode=auth_mode,
             client_secrets=client_secrets,
-            oauth2_scopes=oauth2_scopes,
+            oauth2_scopes=_OAUTH2_SCOPES,
             delegated_email_address=delegated_email_address,
             local_server_port=local_server_port
         )
 
+        # httplib2 is not thread-safe, so an instance must not be used from several threads.
+        self._http = authorized_http(credentials)
+
         # http://googleapis.github.io/google-api-python-client/docs/dyn/sheets_v4.html
-        self.sheets = build(
-            serviceName="sheets",
+        self.sheets = build_service(
+            service_name="sheets",
             version="v4",
-            credentials=credentials
+            http=self._http
         )
 
+    def close(self):
+        """
+        Closes the connections kept alive by this instance. The instance can not be used afterwards.
+        """
+
+        self._http.close()
+
     def get_values(self, spreadsheet_id, range, major_dimension="ROWS", value_render_option="FORMATTED_VALUE"):
         """
         Returns a range of values from a spreadsheet.
@@ -93,3 +110,37 @@ class GoogleSheets:
             majorDimension=major_dimension,
             valueRenderOption=value_render_option
         ).execute()
+
+    def iter_values(self, spreadsheet_id, range, major_dimension="ROWS", value_render_option="FORMATTED_VALUE"):
+        """
+        Returns a range of values from a spreadsheet, one row (or column, see `major_dimension`) at a time.
+        The response body is downloaded in full, like get_values, but rows are decoded lazily with ijson
+        while they are consumed, instead of decoding the whole range into Python lists upfront.
+        Requires the `stream` extra (pip install "gsuite[stream]").
+
+        Args:
+            spreadsheet_id (str): The ID of the spreadsheet to retrieve data from.
+            range (str): The A1 notation of the values to retrieve.
+            major_dimension (str): The major dimension that results should use. (default "ROWS")
+            value_render_option: How values should be represented in the output. (default "FORMATTED_VALUE")
+
+        Returns:
+            iterator of list: The values of each major dimension, e.g. ["A1", "B1", "C1"] for the first row.
+        """
+
+        if ijson is None:
+            raise ImportError("iter_values requires ijson, install it with: pip install \"gsuite[stream]\"")
+
+        request = self.sheets.spreadsheets().values().get(
+            spreadsheetId=spreadsheet_id,
+            range=range,
+            majorDimension=major_dimension,
+            valueRenderOption=value_render_option
+        )
+
+        # Keep the execute() behavior (headers, retries, error handling, POST for long URIs),
+        # but get the raw body back instead of the fully decoded response.
+        request.postproc = lambda response, content: content
+        content = request.execute()
+
+        return ijson.items(io.BytesIO(content), "values.item", use_float=True)
@@ -0,0 +1,81 @@
+import functools
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from gsuite.auth import refresh_ahead
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import UnknownApiNameOrVersion
+
+
+# Timeout in seconds of every HTTP request sent to Google API.
+_HTTP_TIMEOUT = 30
+
+
+class _RefreshAheadHttp(AuthorizedHttp):
+    """
+    AuthorizedHttp which starts refreshing the credentials in the background shortly before they expire.
+    """
+
+    def request(self, *args, **kwargs):
+        refresh_ahead(self.credentials)
+        return super().request(*args, **kwargs)
+
+
+def authorized_http(credentials):
+    """
+    Creates a new HTTP client which authorizes every request with the given credentials.
+
+    httplib2.Http is not thread-safe, so a client must not be shared between threads.
+
+    Args:
+        credentials (google.auth.credentials.Credentials): The credentials used to authorize the requests.
+
+    Returns:
+        google_auth_httplib2.AuthorizedHttp: The authorized HTTP client.
+    """
+
+    return _RefreshAheadHttp(credentials, http=httplib2.Http(timeout=_HTTP_TIMEOUT))
+
+
+def build_service(service_name, version, http):
+    """
+    Returns a new Resource object to interact with a Google API service.
+
+    The Resource sends its requests through `http`. Like the client itself, it must not be shared between threads.
+
+    Args:
+        service_name (str): Name of the service, e.g. "admin".
+        version (str): The version of the service, e.g. "directory_v1".
+        http (google_auth_httplib2.AuthorizedHttp): The authorized HTTP client to send the requests with (see authorized_http).
+
+    Returns:
+        googleapiclient.discovery.Resource: A Resource object with methods for interacting with the service.
+    """
+
+    # The document is passed as text so that every Resource gets its own parsed copy:
+    # googleapiclient modifies the method descriptions in place whenever a nested resource is created.
+    return build_from_document(
+        _discovery_document(service_name, version),
+        http=http
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _discovery_document(service_name, version):
+    """
+    Private method to load the discovery document bundled with google-api-python-client.
+    The document is read once per process, instead of on every build, and never fetched from googleapis.com.
+
+    Args:
+        service_name (str): Name of the service, e.g. "admin".
+        version (str): The version of the service, e.g. "directory_v1".
+
+    Returns:
+        str: The discovery document, in json format.
+    """
+
+    document = get_static_doc(service_name, version)
+    if document is None:
+        raise UnknownApiNameOrVersion(f"name: {service_name}  version: {version}")
+
+    return document
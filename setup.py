@@ -16,6 +16,13 @@ setup(
     description="Python library to interact with Google Suite API",
     long_description=long_description,
     long_description_content_type="text/markdown",
-    install_requires=["google-api-python-client==1.8.0", "google-auth-oauthlib==0.4.1"],
-    python_requires=">=3",
+    install_requires=[
+        "google-api-python-client>=2.100",
+        "google-auth>=2.20",
+        "google-auth-httplib2>=0.1.1",
+        "google-auth-oauthlib>=1.0",
+        "httplib2>=0.19",
+    ],
+    extras_require={"fast": ["orjson>=3.9"], "stream": ["ijson>=3.1"]},
+    python_requires=">=3.8",
 )